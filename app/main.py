@@ -8,18 +8,52 @@ and eventually for routing transactions.
 
 # Standard library imports
 import os
+import time
 import httpx # NEW: Import httpx for async HTTP requests
 import google.generativeai as genai # NEW: For Google Gemini API
 import asyncio
+from urllib.parse import urlsplit
 # Third-party imports (ordered as per PEP 8 suggestion)
+import requests
+from cachetools import TTLCache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException # NEW: Import HTTPException for errors
+from fastapi.responses import ORJSONResponse, StreamingResponse # NEW: orjson serialization + streaming the AI explanation
 from web3 import Web3
 from web3.exceptions import Web3Exception # Specific exception for Web3 errors
 LI_FI_API_BASE_URL = "https://li.quest/v1" # This is LI.FI's main API base URL
 # Load environment variables from .env file at the very start
 load_dotenv()
 LI_FI_API_KEY = os.getenv("LI_FI_API_KEY")
+
+# --- NEW: Import Pydantic for input validation ---
+# Defined up top (before any endpoint) so FastAPI compiles the OpenAPI
+# schema and validators at import time rather than on the first request
+from pydantic import BaseModel, Field # NEW
+
+# Define the structure of a routing request
+class RouteRequest(BaseModel):
+    transaction_type: str = Field(..., example="simple_transfer", description="Type of transaction (e.g., 'simple_transfer', 'token_swap')")
+    amount_usd: float = Field(..., gt=0, example=100.0, description="Estimated USD value of the transaction for relative cost calculation")
+    user_preference: str = Field("cheapest", example="cheapest", description="User's preference: 'cheapest' or 'fastest'")
+    # For MVP, we assume current chain has the token, and target is just any chain.
+    # Later, we can add source_token, target_token, etc.
+
+# The parts of a /route recommendation the explanation prompt indexes into;
+# typed so a schema-valid body can't crash the prompt builder with a KeyError
+class RecommendationData(BaseModel):
+    chain: str = Field(..., description="Display name of the recommended chain")
+    reason: str = Field(..., description="Why this chain was recommended")
+    details: dict = Field(..., description="Fee and timing details for the recommended chain")
+
+# Payload for /route/explain: the client sends back the pieces of the /route
+# response it wants explained, so the explanation can stream separately
+class ExplainRequest(BaseModel):
+    request: dict = Field(default_factory=dict, description="The original routing request data")
+    recommendation: RecommendationData = Field(..., description="The recommendation object returned by /route")
+    all_chains_metrics: list[dict] = Field(default_factory=list, description="Compact metrics for all considered chains")
 # In main.py
 # Add a new dictionary for common token addresses on different chains
 COMMON_TOKEN_ADDRESSES = {
@@ -36,7 +70,34 @@ if not GEMINI_API_KEY:
 else:
     genai.configure(api_key=GEMINI_API_KEY)
 # --- FastAPI App Instance ---
-app = FastAPI()
+# orjson serializes the nested /route payload several times faster than the
+# stdlib json default and is a drop-in for the types we return
+app = FastAPI(default_response_class=ORJSONResponse)
+
+# --- NEW: One shared HTTP client for all outbound calls ---
+# Reusing a single pooled client keeps connections alive between requests,
+# so repeat CoinGecko calls skip the TCP+TLS handshake entirely.
+http_client: httpx.AsyncClient | None = None
+
+@app.on_event("startup")
+async def create_http_client():
+    global http_client
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        timeout=httpx.Timeout(5.0, connect=2.0)
+    )
+    app.state.http = http_client
+
+@app.on_event("shutdown")
+async def close_http_client():
+    if http_client:
+        await http_client.aclose()
+
+@app.on_event("startup")
+async def warm_up_request_model():
+    # One dummy round through the model forces pydantic-core's validator
+    # and serializer warm-up before the first real /route request hits it
+    RouteRequest(transaction_type="simple_transfer", amount_usd=1.0, user_preference="cheapest").model_dump()
 
 # --- NEW: Centralized Chain Configuration ---
 # This dictionary will hold all static and dynamic info needed for each chain.
@@ -51,42 +112,69 @@ COINGECKO_TOKEN_MAP = {
      "BNB": "binancecoin",# CoinGecko ID for Avalanche's AVAX
     # Add more if you expand chains
 }
-async def get_token_prices_usd(token_symbols: list[str]) -> dict:
+# --- NEW: Short-lived cache for CoinGecko prices ---
+# Native token prices barely move within a minute, and CoinGecko's free tier
+# rate-limits aggressively, so repeated /route calls reuse a recent result.
+PRICE_CACHE_TTL_SECONDS = float(os.getenv("PRICE_CACHE_TTL_SECONDS", "45"))
+_price_cache: dict[tuple[str, ...], tuple[float, dict]] = {} # key -> (monotonic_ts, prices)
+_price_cache_lock = asyncio.Lock()
+
+async def get_token_prices_usd(token_symbols: list[str] | tuple[str, ...]) -> dict:
     """
     Fetches the current USD prices for a list of token symbols from CoinGecko.
-    Returns a dictionary mapping token symbol to its USD price.
+    Results are cached for PRICE_CACHE_TTL_SECONDS to skip the HTTP round-trip
+    on repeat calls. Returns a dictionary mapping token symbol to its USD price.
     """
-    coingecko_ids = [COINGECKO_TOKEN_MAP[s] for s in token_symbols if s in COINGECKO_TOKEN_MAP]
-    if not coingecko_ids:
+    cache_key = tuple(sorted(token_symbols))
+    cached = _price_cache.get(cache_key)
+    if cached and time.monotonic() - cached[0] < PRICE_CACHE_TTL_SECONDS:
+        return cached[1]
+
+    # The per-route call always asks for the static native token set, so the
+    # ids string is precomputed for it; anything else is built on the miss path
+    if cache_key == NATIVE_TOKEN_SYMBOLS:
+        ids_string = NATIVE_COINGECKO_IDS_STRING
+    else:
+        ids_string = ",".join(COINGECKO_TOKEN_MAP[s] for s in token_symbols if s in COINGECKO_TOKEN_MAP)
+    if not ids_string:
         return {}
 
-    ids_string = ",".join(coingecko_ids)
     params = {
         "ids": ids_string,
         "vs_currencies": "usd"
     }
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(f"{COINGECKO_API_BASE_URL}/simple/price", params=params, timeout=5)
-            response.raise_for_status() # Raise an exception for HTTP errors (4xx or 5xx)
-            data = response.json()
-
-            prices = {}
-            for symbol in token_symbols:
-                coingecko_id = COINGECKO_TOKEN_MAP.get(symbol)
-                if coingecko_id and coingecko_id in data and "usd" in data[coingecko_id]:
-                    prices[symbol] = data[coingecko_id]["usd"]
-                else:
-                    print(f"WARNING: Could not fetch price for {symbol} (CoinGecko ID: {coingecko_id})")
-                    prices[symbol] = None # Indicate that price couldn't be fetched
-            return prices
-        except httpx.RequestError as e:
-            print(f"Error fetching prices from CoinGecko (RequestError): {e}")
-            return {symbol: None for symbol in token_symbols} # Return None for all if request fails
-        except Exception as e:
-            print(f"An unexpected error occurred while fetching prices: {e}")
-            return {symbol: None for symbol in token_symbols}
+    async with _price_cache_lock:
+        # Re-check under the lock: a concurrent request may have refreshed
+        # the cache while we were waiting, so only one fetch goes out.
+        cached = _price_cache.get(cache_key)
+        if cached and time.monotonic() - cached[0] < PRICE_CACHE_TTL_SECONDS:
+            return cached[1]
+        return await _fetch_token_prices(cache_key, token_symbols, params)
+
+async def _fetch_token_prices(cache_key: tuple, token_symbols: list[str], params: dict) -> dict:
+    try:
+        # Use the shared pooled client created at startup (keep-alive reuse)
+        response = await http_client.get(f"{COINGECKO_API_BASE_URL}/simple/price", params=params)
+        response.raise_for_status() # Raise an exception for HTTP errors (4xx or 5xx)
+        data = response.json()
+
+        prices = {}
+        for symbol in token_symbols:
+            coingecko_id = COINGECKO_TOKEN_MAP.get(symbol)
+            if coingecko_id and coingecko_id in data and "usd" in data[coingecko_id]:
+                prices[symbol] = data[coingecko_id]["usd"]
+            else:
+                print(f"WARNING: Could not fetch price for {symbol} (CoinGecko ID: {coingecko_id})")
+                prices[symbol] = None # Indicate that price couldn't be fetched
+        _price_cache[cache_key] = (time.monotonic(), prices)
+        return prices
+    except httpx.RequestError as e:
+        print(f"Error fetching prices from CoinGecko (RequestError): {e}")
+        return {symbol: None for symbol in token_symbols} # Return None for all if request fails
+    except Exception as e:
+        print(f"An unexpected error occurred while fetching prices: {e}")
+        return {symbol: None for symbol in token_symbols}
         
 CHAIN_CONFIGS = {
     "ethereum": {
@@ -162,26 +250,102 @@ CHAIN_CONFIGS = {
     # }
 }
 
+# CHAIN_CONFIGS never changes at runtime, so derive these once at import
+# instead of rebuilding the symbol set (and the CoinGecko ids string) on
+# every /route call. Sorted so the tuple doubles as a stable cache key.
+NATIVE_TOKEN_SYMBOLS = tuple(sorted({
+    config["native_token_symbol"] for config in CHAIN_CONFIGS.values()
+}))
+NATIVE_COINGECKO_IDS_STRING = ",".join(
+    COINGECKO_TOKEN_MAP[s] for s in NATIVE_TOKEN_SYMBOLS if s in COINGECKO_TOKEN_MAP
+)
+
 # --- NEW: Dictionary to store initialized Web3 instances ---
 # We'll initialize these once when the app starts
 w3_clients = {}
+_rpc_urls = {} # chain -> configured RPC URL, used for batched JSON-RPC calls
+_rpc_sessions = {} # chain -> requests.Session, kept referenced so it isn't GC'd
+
+def _make_rpc_session() -> requests.Session:
+    # Tuned session so concurrent calls to the same RPC reuse kept-alive
+    # connections instead of re-handshaking (the default adapter pool is 10)
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=20,
+        pool_maxsize=100,
+        max_retries=Retry(total=2, backoff_factor=0.2)
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+# Rolling per-chain health flags, refreshed by a background task. Checking
+# is_connected() inline would issue an extra web3_clientVersion RPC on every
+# single metrics fetch, doubling the endpoint's RPC traffic.
+w3_healthy: dict[str, bool] = {}
+HEALTH_CHECK_INTERVAL_SECONDS = float(os.getenv("HEALTH_CHECK_INTERVAL_SECONDS", "30"))
+
+# Initialize Web3 clients for each configured chain. Runs from the startup
+# event rather than at import so that, under multiple uvicorn/gunicorn
+# workers, every worker builds its own clients, sessions and caches on its
+# own event loop instead of inheriting import-time state.
+def init_web3_clients():
+    for chain_name, config in CHAIN_CONFIGS.items():
+        rpc_url = os.getenv(config["rpc_url_env_var"])
+        if rpc_url:
+            _rpc_urls[chain_name] = rpc_url
+            try:
+                _rpc_sessions[chain_name] = _make_rpc_session()
+                w3_clients[chain_name] = Web3(Web3.HTTPProvider(
+                    rpc_url,
+                    session=_rpc_sessions[chain_name],
+                    request_kwargs={"timeout": 5}
+                ))
+                # Optional: Check connection immediately
+                w3_healthy[chain_name] = w3_clients[chain_name].is_connected()
+                if not w3_healthy[chain_name]:
+                    # Keep the client; the background probe may bring it back
+                    print(f"WARNING: Could not connect to {config['display_name']} RPC at {rpc_url}")
+            except Exception as e:
+                print(f"ERROR: Failed to initialize Web3 for {config['display_name']}: {e}")
+                w3_clients[chain_name] = None
+        else:
+            print(f"WARNING: RPC URL for {config['display_name']} not found in .env")
+            w3_clients[chain_name] = None
+
+@app.on_event("startup")
+async def startup_web3_clients():
+    init_web3_clients()
 
-# Initialize Web3 clients for each configured chain
-for chain_name, config in CHAIN_CONFIGS.items():
-    rpc_url = os.getenv(config["rpc_url_env_var"])
-    if rpc_url:
+def _probe_health_sync():
+    # Issues one web3_clientVersion call per chain; runs in a worker thread
+    for chain_name, w3 in w3_clients.items():
+        if w3 is None:
+            continue
         try:
-            w3_clients[chain_name] = Web3(Web3.HTTPProvider(rpc_url))
-            # Optional: Check connection immediately
-            if not w3_clients[chain_name].is_connected():
-                print(f"WARNING: Could not connect to {config['display_name']} RPC at {rpc_url}")
-                w3_clients[chain_name] = None # Set to None if connection fails
-        except Exception as e:
-            print(f"ERROR: Failed to initialize Web3 for {config['display_name']}: {e}")
-            w3_clients[chain_name] = None
-    else:
-        print(f"WARNING: RPC URL for {config['display_name']} not found in .env")
-        w3_clients[chain_name] = None
+            w3_healthy[chain_name] = w3.is_connected()
+        except Exception:
+            w3_healthy[chain_name] = False
+
+async def _health_check_loop():
+    while True:
+        await asyncio.to_thread(_probe_health_sync)
+        await asyncio.sleep(HEALTH_CHECK_INTERVAL_SECONDS)
+
+# Strong reference to the prober task: the event loop only keeps weak
+# references, so an unreferenced task can be garbage-collected mid-lifetime
+# and chains flagged unhealthy would never be restored.
+_health_check_task: asyncio.Task | None = None
+
+@app.on_event("startup")
+async def start_health_checks():
+    global _health_check_task
+    _health_check_task = asyncio.create_task(_health_check_loop())
+
+@app.on_event("shutdown")
+async def stop_health_checks():
+    if _health_check_task:
+        _health_check_task.cancel()
 
 # --- Existing Routes ---
 @app.get("/")
@@ -211,9 +375,20 @@ async def generate_explanation(request_data: dict, recommendation_data: dict, al
         return "Generative AI explanation is not available (API key missing)."
 
     model = genai.GenerativeModel('gemini-2.0-flash') # Using gemini-pro model
+    prompt = _build_explanation_prompt(request_data, recommendation_data, all_chains_metrics)
 
+    try:
+        # The SDK's native async call yields to the event loop during I/O,
+        # so no worker thread sits parked for the whole Gemini round-trip
+        response = await model.generate_content_async(prompt)
+        return response.text
+    except Exception as e:
+        print(f"Error generating AI explanation: {e}")
+        return f"Could not generate AI explanation: {str(e)}"
+
+def _build_explanation_prompt(request_data: dict, recommendation_data: dict, all_chains_metrics: list[dict]) -> str:
     # Craft a detailed prompt based on the request and recommendation
-    prompt = (
+    return (
         "You are an expert blockchain financial advisor for a personal finance app called 'Mango Web App'. "
         "Your task is to explain a blockchain routing recommendation in a clear, concise, and helpful way. "
         "Highlight why the recommended chain was chosen based on the user's preference and current market data. "
@@ -227,55 +402,160 @@ async def generate_explanation(request_data: dict, recommendation_data: dict, al
         "\n\nBased on this information, provide a concise explanation (max 150 words):"
     )
 
+def _fetch_gas_sync(w3):
+    # web3.py's HTTPProvider is synchronous; this runs in a worker thread
+    return w3.eth.gas_price
+
+# --- NEW: Short-lived per-chain gas price cache ---
+# Gas prices only really change block-to-block, so a burst of /route calls
+# shouldn't each fan out a fresh eth_gasPrice to every RPC provider.
+GAS_CACHE_TTL_SECONDS = float(os.getenv("GAS_CACHE_TTL_SECONDS", "2.0"))
+_gas_cache: dict[str, tuple[float, int]] = {} # chain -> (monotonic_ts, wei)
+_gas_locks: dict[str, asyncio.Lock] = {}
+
+# Hosts that rejected a JSON-RPC batch request once; those chains stay on the
+# per-chain web3.py path instead of being retried every call
+_batch_unsupported_hosts: set[str] = set()
+
+async def _batch_fetch_gas_for_endpoint(rpc_url: str, chain_names: list[str]):
+    """
+    Sends one JSON-RPC batch request (eth_gasPrice per chain) to a single
+    endpoint and seeds the gas cache with the results.
+    """
+    host = urlsplit(rpc_url).hostname
+    batch = [
+        {"jsonrpc": "2.0", "id": i, "method": "eth_gasPrice", "params": []}
+        for i in range(len(chain_names))
+    ]
     try:
-        # Running synchronous API call in an async context
-        # Use `await asyncio.to_thread` if you encounter performance issues with many sync calls
-        response = await asyncio.to_thread(model.generate_content, prompt)
-        return response.text
+        response = await http_client.post(rpc_url, json=batch)
+        if response.status_code == 400:
+            # Provider doesn't accept batches; remember and fall back to web3.py
+            _batch_unsupported_hosts.add(host)
+            return
+        response.raise_for_status()
+        results = response.json()
+        if not isinstance(results, list):
+            _batch_unsupported_hosts.add(host)
+            return
+        by_id = {entry.get("id"): entry for entry in results}
+        now = time.monotonic()
+        for i, chain_name in enumerate(chain_names):
+            entry = by_id.get(i)
+            if entry and "result" in entry:
+                _gas_cache[chain_name] = (now, int(entry["result"], 16)) # hex wei
     except Exception as e:
-        print(f"Error generating AI explanation: {e}")
-        return f"Could not generate AI explanation: {str(e)}"
-async def get_chain_metrics(chain_name: str):
+        print(f"WARNING: Batch gas price fetch against {host} failed: {e}")
+
+async def _prefetch_gas_prices():
     """
-    Fetches real-time metrics (like gas price) and static properties
-    for a given blockchain.
+    Refreshes stale gas cache entries with one JSON-RPC batch request per
+    RPC endpoint. Chains that share an endpoint URL collapse into a single
+    HTTP round-trip; get_chain_metrics then hits the warm cache. Chains on
+    endpoints that don't support batching keep the per-chain fallback.
+    """
+    now = time.monotonic()
+    by_endpoint: dict[str, list[str]] = {}
+    for chain_name, config in CHAIN_CONFIGS.items():
+        rpc_url = _rpc_urls.get(chain_name)
+        if not rpc_url or not w3_clients.get(chain_name):
+            continue
+        host = urlsplit(rpc_url).hostname
+        if not host or host in _batch_unsupported_hosts:
+            continue
+        ttl = min(GAS_CACHE_TTL_SECONDS, config["avg_block_time_seconds"])
+        cached = _gas_cache.get(chain_name)
+        if cached and now - cached[0] < ttl:
+            continue # Still fresh, nothing to fetch
+        by_endpoint.setdefault(rpc_url, []).append(chain_name)
+
+    if by_endpoint:
+        await asyncio.gather(*(
+            _batch_fetch_gas_for_endpoint(rpc_url, chain_names)
+            for rpc_url, chain_names in by_endpoint.items()
+        ))
+
+async def _collect_chain_metrics(chain_name: str):
+    """
+    Internal metrics fetch used on the /route hot path. Returns the metrics
+    dict, or None when the chain is unavailable - failures are logged here
+    rather than raised, so degraded chains don't cost an exception raise and
+    catch per request.
     """
     chain_name_lower = chain_name.lower()
     config = CHAIN_CONFIGS.get(chain_name_lower)
     w3 = w3_clients.get(chain_name_lower)
 
     if not config:
-        raise HTTPException(status_code=404, detail=f"Chain '{chain_name}' not supported.")
-    if not w3 or not w3.is_connected():
-        raise HTTPException(status_code=503, detail=f"RPC for {config['display_name']} not connected or URL not set correctly.")
+        print(f"WARNING: Chain '{chain_name}' not supported.")
+        return None
+    # Read the rolling health flag instead of issuing an is_connected() RPC
+    if not w3 or not w3_healthy.get(chain_name_lower):
+        print(f"Skipping {config['display_name']}: RPC not connected or URL not set correctly.")
+        return None
 
     try:
-        gas_price_wei = w3.eth.gas_price
+        # Refreshing faster than the chain produces blocks is wasted work,
+        # so cap the TTL at the chain's average block time
+        ttl = min(GAS_CACHE_TTL_SECONDS, config["avg_block_time_seconds"])
+        cached = _gas_cache.get(chain_name_lower)
+        if cached and time.monotonic() - cached[0] < ttl:
+            gas_price_wei = cached[1]
+        else:
+            # Per-chain lock so concurrent cache misses trigger one refresh
+            lock = _gas_locks.setdefault(chain_name_lower, asyncio.Lock())
+            async with lock:
+                cached = _gas_cache.get(chain_name_lower)
+                if cached and time.monotonic() - cached[0] < ttl:
+                    gas_price_wei = cached[1]
+                else:
+                    # Run the blocking JSON-RPC call in a thread so the event
+                    # loop stays free to serve other requests during the RTT
+                    gas_price_wei = await asyncio.to_thread(_fetch_gas_sync, w3)
+                    _gas_cache[chain_name_lower] = (time.monotonic(), gas_price_wei)
         gas_price_gwei = w3.from_wei(gas_price_wei, 'gwei')
 
         return {
             "chain": config["display_name"],
             "native_token_symbol": config["native_token_symbol"],
             "gas_price_wei": gas_price_wei,
-            "gas_price_gwei": float(f"{gas_price_gwei:.2f}"),
+            # from_wei returns a Decimal; keep a plain float for the
+            # downstream fee arithmetic and JSON output
+            "gas_price_gwei": round(float(gas_price_gwei), 2),
             "avg_block_time_seconds": config["avg_block_time_seconds"], # This is a static property
             "explorer_url": config["explorer_url"]
         }
     except Web3Exception as e:
-        raise HTTPException(status_code=500, detail=f"Web3 error fetching metrics for {config['display_name']}: {str(e)}")
+        # Mark the chain unhealthy; the background probe will re-check it
+        w3_healthy[chain_name_lower] = False
+        print(f"Web3 error fetching metrics for {config['display_name']}: {e}")
+        return None
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"An unexpected error occurred while fetching metrics for {config['display_name']}: {str(e)}")
-
-# --- NEW: Import Pydantic for input validation ---
-from pydantic import BaseModel, Field # NEW
+        w3_healthy[chain_name_lower] = False
+        print(f"An unexpected error occurred while fetching metrics for {config['display_name']}: {e}")
+        return None
 
-# Define the structure of a routing request
-class RouteRequest(BaseModel):
-    transaction_type: str = Field(..., example="simple_transfer", description="Type of transaction (e.g., 'simple_transfer', 'token_swap')")
-    amount_usd: float = Field(..., gt=0, example=100.0, description="Estimated USD value of the transaction for relative cost calculation")
-    user_preference: str = Field("cheapest", example="cheapest", description="User's preference: 'cheapest' or 'fastest'")
-    # For MVP, we assume current chain has the token, and target is just any chain.
-    # Later, we can add source_token, target_token, etc.
+async def get_chain_metrics(chain_name: str):
+    """
+    Fetches real-time metrics (like gas price) and static properties
+    for a given blockchain. Raises HTTPException when the chain is
+    unknown or currently unavailable.
+    """
+    if chain_name.lower() not in CHAIN_CONFIGS:
+        raise HTTPException(status_code=404, detail=f"Chain '{chain_name}' not supported.")
+    metrics = await _collect_chain_metrics(chain_name)
+    if metrics is None:
+        raise HTTPException(status_code=503, detail=f"Could not fetch metrics for '{chain_name}'. See server logs for details.")
+    return metrics
+
+# --- NEW: Coalescing layer for identical routing requests ---
+# A burst of users asking the same question within a few seconds would each
+# trigger the full chain/price/Gemini fan-out. Concurrent duplicates await
+# one shared in-flight computation, and a short TTL cache serves recent
+# results, so backend work is O(unique requests) instead of O(all requests).
+ROUTE_CACHE_TTL_SECONDS = float(os.getenv("ROUTE_CACHE_TTL_SECONDS", "5"))
+_route_cache: TTLCache = TTLCache(maxsize=256, ttl=ROUTE_CACHE_TTL_SECONDS)
+_route_inflight: dict[tuple, asyncio.Future] = {}
 
 # --- NEW: Endpoint for Intelligent Routing ---
 @app.post("/route")
@@ -283,47 +563,93 @@ async def route_transaction(request: RouteRequest):
     """
     Analyzes different blockchains to recommend the optimal one
     based on user preferences and current network conditions,
-    now with USD cost estimation.
+    now with USD cost estimation. Identical concurrent requests are
+    coalesced and recent results are served from a short-lived cache.
     """
-    # Collect all unique native token symbols from CHAIN_CONFIGS
-    native_token_symbols_to_fetch = list(set(
-        config["native_token_symbol"] for config in CHAIN_CONFIGS.values()
-    ))
-
-    # Fetch token prices concurrently at the start of the routing request
-    token_prices_usd = await get_token_prices_usd(native_token_symbols_to_fetch)
+    cache_key = (request.transaction_type, round(request.amount_usd, 2), request.user_preference)
+    while True:
+        cached = _route_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        inflight = _route_inflight.get(cache_key)
+        if inflight is None:
+            break # Nobody computing this yet; become the leader below
+        try:
+            # shield so a cancelled follower doesn't cancel the shared future
+            return await asyncio.shield(inflight)
+        except asyncio.CancelledError:
+            if not inflight.cancelled():
+                raise # We were cancelled, not the leader
+            # The leader's request was cancelled; loop and recompute
+
+    future = asyncio.get_running_loop().create_future()
+    # Mark any stored exception as retrieved even when no follower awaits it,
+    # otherwise asyncio logs "Future exception was never retrieved" on GC
+    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+    _route_inflight[cache_key] = future
+    try:
+        result = await _compute_route(request)
+        _route_cache[cache_key] = result
+        future.set_result(result)
+        return result
+    except asyncio.CancelledError:
+        # Our client went away; cancel the shared future so coalesced
+        # followers recompute instead of inheriting the cancellation
+        future.cancel()
+        raise
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        _route_inflight.pop(cache_key, None)
+
+async def _compute_route(request: RouteRequest):
+    """
+    Performs the actual routing computation: metric/price fan-out,
+    chain selection and AI explanation.
+    """
+    # Fetch token prices and all per-chain metrics concurrently, so total wall
+    # time is ~one round-trip instead of the sum of every RPC call in sequence
+    # The batch prefetch warms the gas cache with one JSON-RPC request per
+    # endpoint (overlapped with the price fetch); the per-chain tasks then
+    # mostly hit the cache, falling back to individual calls where needed.
+    token_prices_usd, _ = await asyncio.gather(
+        get_token_prices_usd(NATIVE_TOKEN_SYMBOLS),
+        _prefetch_gas_prices()
+    )
+    metrics_results = await asyncio.gather(
+        *(_collect_chain_metrics(chain_name) for chain_name in CHAIN_CONFIGS)
+    )
 
     if not token_prices_usd:
         # This is a critical failure for USD cost comparison
         raise HTTPException(status_code=500, detail="Failed to fetch real-time token prices. Cannot perform cost comparison.")
 
     chain_metrics = []
-    for chain_name, config in CHAIN_CONFIGS.items():
-        try:
-            metrics = await get_chain_metrics(chain_name)
-
-            # --- NEW: Calculate Estimated Fee in USD ---
-            native_token_symbol = config["native_token_symbol"]
-            native_token_price_usd = token_prices_usd.get(native_token_symbol)
-
-            if native_token_price_usd is None:
-                print(f"WARNING: Skipping {config['display_name']} for cost comparison as {native_token_symbol} price not available.")
-                # If price is missing, this chain can't be part of 'cheapest' calculation
-                metrics["estimated_fee_usd"] = float('inf') # Set to infinity so it's not chosen as cheapest
-                metrics["estimated_fee_gwei"] = metrics["gas_price_gwei"] * 21000 # Still calculate gwei
-                metrics["native_token_price_usd"] = None
-            else:
-                estimated_fee_gwei = metrics["gas_price_gwei"] * 21000 # Example gas limit for simple transfer
-                estimated_fee_usd = (estimated_fee_gwei / 1_000_000_000) * native_token_price_usd # Gwei to native token unit, then to USD
-
-                metrics["estimated_fee_gwei"] = estimated_fee_gwei
-                metrics["estimated_fee_usd"] = estimated_fee_usd
-                metrics["native_token_price_usd"] = native_token_price_usd
-
-            chain_metrics.append(metrics)
-        except HTTPException as e:
-            print(f"Skipping {config['display_name']} due to error: {e.detail}")
-            pass # Skip chains that fail to connect/fetch metrics
+    for (chain_name, config), metrics in zip(CHAIN_CONFIGS.items(), metrics_results):
+        if metrics is None:
+            continue # Failure already logged by _collect_chain_metrics
+
+        # --- NEW: Calculate Estimated Fee in USD ---
+        native_token_symbol = config["native_token_symbol"]
+        native_token_price_usd = token_prices_usd.get(native_token_symbol)
+
+        if native_token_price_usd is None:
+            print(f"WARNING: Skipping {config['display_name']} for cost comparison as {native_token_symbol} price not available.")
+            # If price is missing, this chain can't be part of 'cheapest' calculation
+            metrics["estimated_fee_usd"] = float('inf') # Set to infinity so it's not chosen as cheapest
+            metrics["estimated_fee_gwei"] = metrics["gas_price_gwei"] * 21000 # Still calculate gwei
+            metrics["native_token_price_usd"] = None
+        else:
+            estimated_fee_gwei = metrics["gas_price_gwei"] * 21000 # Example gas limit for simple transfer
+            estimated_fee_usd = (estimated_fee_gwei / 1_000_000_000) * native_token_price_usd # Gwei to native token unit, then to USD
+
+            metrics["estimated_fee_gwei"] = estimated_fee_gwei
+            metrics["estimated_fee_usd"] = estimated_fee_usd
+            metrics["native_token_price_usd"] = native_token_price_usd
+
+        chain_metrics.append(metrics)
 
     if not chain_metrics:
         raise HTTPException(status_code=500, detail="Could not fetch metrics for any supported chain.")
@@ -345,52 +671,68 @@ async def route_transaction(request: RouteRequest):
 
     if not optimal_chain:
         raise HTTPException(status_code=500, detail="Could not determine an optimal chain.")
-    ai_explanation = await generate_explanation(
-    request.dict(), # Pass the request data
-    {
-        "chain": optimal_chain["chain"],
-        "reason": f"Based on your preference for the {request.user_preference} transaction, "
-                  f"{optimal_chain['chain']} was chosen.",
-        "details": {
-            "estimated_gas_fee_gwei": float(f"{optimal_chain['estimated_fee_gwei']:.2f}"),
-            "estimated_gas_fee_usd": float(f"{optimal_chain['estimated_fee_usd']:.4f}") if optimal_chain['estimated_fee_usd'] != float('inf') else "N/A",
-            "estimated_time_seconds": optimal_chain["avg_block_time_seconds"],
-            "native_token": optimal_chain["native_token_symbol"],
-            "current_gas_price_gwei": optimal_chain["gas_price_gwei"],
-            "native_token_price_usd": optimal_chain.get("native_token_price_usd")
-        }
-    },
-    [
+    # Build the recommendation structures once and share them between the
+    # explanation prompt and the HTTP response, instead of constructing two
+    # nearly identical copies of every dict and formatted number
+    request_data = request.model_dump() # Pydantic v2: C-accelerated, computed once
+    reason = (f"Based on your preference for the {request.user_preference} transaction, "
+              f"{optimal_chain['chain']} was chosen.")
+    details = {
+        "estimated_gas_fee_gwei": round(optimal_chain['estimated_fee_gwei'], 2),
+        "estimated_gas_fee_usd": round(optimal_chain['estimated_fee_usd'], 4) if optimal_chain['estimated_fee_usd'] != float('inf') else "N/A",
+        "estimated_time_seconds": optimal_chain["avg_block_time_seconds"],
+        "native_token": optimal_chain["native_token_symbol"],
+        "current_gas_price_gwei": optimal_chain["gas_price_gwei"],
+        "native_token_price_usd": optimal_chain.get("native_token_price_usd") # Add price for context
+    }
+    all_chains_compact = [
         {
             "chain": m["chain"],
-            "estimated_gas_fee_gwei": float(f"{m['estimated_fee_gwei']:.2f}"),
-            "estimated_fee_usd": float(f"{m['estimated_fee_usd']:.4f}") if m['estimated_fee_usd'] != float('inf') else "N/A",
+            "estimated_gas_fee_gwei": round(m['estimated_fee_gwei'], 2),
+            "estimated_fee_usd": round(m['estimated_fee_usd'], 4) if m['estimated_fee_usd'] != float('inf') else "N/A",
             "avg_block_time_seconds": m["avg_block_time_seconds"]
         } for m in chain_metrics
     ]
-)
 
+    # The AI explanation is no longer awaited here: clients get the numeric
+    # recommendation immediately and stream the explanation from
+    # /route/explain, so /route latency is bounded by the data fetches alone
     return {
-        "request": request.dict(),
+        "request": request_data,
         "recommendation": {
             "chain": optimal_chain["chain"],
-            "reason": (f"Based on your preference for the {request.user_preference} transaction, "
-                       f"{optimal_chain['chain']} was chosen."),
-            "details": {
-                "estimated_gas_fee_gwei": float(f"{optimal_chain['estimated_fee_gwei']:.2f}"),
-                "estimated_gas_fee_usd": float(f"{optimal_chain['estimated_fee_usd']:.4f}") if optimal_chain['estimated_fee_usd'] != float('inf') else "N/A",
-                "estimated_time_seconds": optimal_chain["avg_block_time_seconds"],
-                "native_token": optimal_chain["native_token_symbol"],
-                "current_gas_price_gwei": optimal_chain["gas_price_gwei"],
-                "native_token_price_usd": optimal_chain.get("native_token_price_usd") # Add price for context
-            }, "ai_explanation": ai_explanation # NEW: Add the AI explanation here
-        }, 
-        "all_chains_metrics": [
-            {
-                "chain": m["chain"],
-                "estimated_gas_fee_gwei": float(f"{m['estimated_fee_gwei']:.2f}"),
-                "estimated_fee_usd": float(f"{m['estimated_fee_usd']:.4f}") if m['estimated_fee_usd'] != float('inf') else "N/A",
-                "avg_block_time_seconds": m["avg_block_time_seconds"]
-            } for m in chain_metrics
-        ]
+            "reason": reason,
+            "details": details
+        },
+        "all_chains_metrics": all_chains_compact
     }
+
+# --- NEW: Streaming endpoint for the AI explanation ---
+@app.post("/route/explain")
+async def stream_route_explanation(explain_request: ExplainRequest):
+    """
+    Streams the AI explanation for a routing recommendation as it is
+    generated, so clients can render text as it arrives instead of
+    waiting out the full Gemini round-trip.
+    """
+    prompt = _build_explanation_prompt(
+        explain_request.request,
+        explain_request.recommendation.model_dump(),
+        explain_request.all_chains_metrics
+    )
+
+    async def iter_chunks():
+        if not GEMINI_API_KEY:
+            yield "Generative AI explanation is not available (API key missing)."
+            return
+        model = genai.GenerativeModel('gemini-2.0-flash')
+        try:
+            response = await model.generate_content_async(prompt, stream=True)
+            async for chunk in response:
+                if chunk.text:
+                    yield chunk.text
+        except Exception as e:
+            print(f"Error generating AI explanation: {e}")
+            yield f"Could not generate AI explanation: {str(e)}"
+
+    return StreamingResponse(iter_chunks(), media_type="text/plain")
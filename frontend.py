@@ -8,7 +8,7 @@ import asyncio # For running async code in Streamlit (Streamlit doesn't natively
 FASTAPI_BASE_URL = "http://127.0.0.1:8000" # Your FastAPI app's URL
 
 # --- Async function to call your FastAPI /route endpoint ---
-async def get_routing_recommendation(transaction_type: str, amount_usd: float, user_preference: str):
+async def get_routing_recommendation(client: httpx.AsyncClient, transaction_type: str, amount_usd: float, user_preference: str):
     url = f"{FASTAPI_BASE_URL}/route"
     payload = {
         "transaction_type": transaction_type,
@@ -16,20 +16,42 @@ async def get_routing_recommendation(transaction_type: str, amount_usd: float, u
         "user_preference": user_preference
     }
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(url, json=payload, timeout=10) # Add a timeout
-            response.raise_for_status() # Raise an exception for HTTP errors (4xx or 5xx)
-            return response.json()
-        except httpx.RequestError as e:
-            st.error(f"Network error communicating with backend: {e}")
-            return None
-        except httpx.HTTPStatusError as e:
-            st.error(f"Backend returned an error: {e.response.status_code} - {e.response.text}")
-            return None
-        except Exception as e:
-            st.error(f"An unexpected error occurred: {e}")
-            return None
+    try:
+        response = await client.post(url, json=payload) # Shared client, pooled connection
+        response.raise_for_status() # Raise an exception for HTTP errors (4xx or 5xx)
+        return response.json()
+    except httpx.RequestError as e:
+        st.error(f"Network error communicating with backend: {e}")
+        return None
+    except httpx.HTTPStatusError as e:
+        st.error(f"Backend returned an error: {e.response.status_code} - {e.response.text}")
+        return None
+    except Exception as e:
+        st.error(f"An unexpected error occurred: {e}")
+        return None
+
+# --- Async function to stream the AI explanation from /route/explain ---
+async def stream_ai_explanation(client: httpx.AsyncClient, recommendation_data: dict, placeholder):
+    url = f"{FASTAPI_BASE_URL}/route/explain"
+    payload = {
+        "request": recommendation_data.get("request", {}),
+        "recommendation": recommendation_data.get("recommendation", {}),
+        "all_chains_metrics": recommendation_data.get("all_chains_metrics", [])
+    }
+
+    explanation = ""
+    try:
+        # Render each chunk as it arrives instead of waiting for the full text
+        async with client.stream("POST", url, json=payload, timeout=30) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_text():
+                explanation += chunk
+                placeholder.markdown(explanation + "▌")
+        placeholder.markdown(explanation)
+        return explanation
+    except Exception as e:
+        st.error(f"Could not stream AI explanation: {e}")
+        return None
 
 # --- Streamlit UI Layout ---
 st.set_page_config(
@@ -38,6 +60,17 @@ st.set_page_config(
     layout="centered"
 )
 
+# --- Reuse one event loop and one pooled HTTP client across reruns ---
+# asyncio.run would create and tear down a fresh loop (and with it any
+# connection pool) on every form submit; keeping both in session_state
+# preserves keep-alive connections between requests.
+if "loop" not in st.session_state:
+    st.session_state.loop = asyncio.new_event_loop()
+    st.session_state.client = httpx.AsyncClient(
+        timeout=10,
+        limits=httpx.Limits(max_keepalive_connections=5)
+    )
+
 st.title("🔗 Nexus Router: Your Intelligent Cross-Chain Guide")
 st.write("Find the optimal blockchain for your transaction based on real-time data.")
 
@@ -74,10 +107,10 @@ if submit_button:
     st.subheader("Nexus's Recommendation:")
 
     with st.spinner("Analyzing blockchain networks..."):
-        # Run the async function using asyncio
-        # Streamlit runs synchronous code, so we need to manage async calls
-        recommendation_data = asyncio.run(
-            get_routing_recommendation(transaction_type, amount_usd, user_preference)
+        # Streamlit runs synchronous code, so we drive the async call on the
+        # long-lived loop kept in session_state (see above)
+        recommendation_data = st.session_state.loop.run_until_complete(
+            get_routing_recommendation(st.session_state.client, transaction_type, amount_usd, user_preference)
         )
 
     if recommendation_data:
@@ -110,13 +143,12 @@ if submit_button:
             st.markdown("---")
             st.subheader("Comparison Across Chains:")
             st.markdown("---")
-            # NEW: Display AI Explanation
-            ai_explanation = rec.get("ai_explanation")
-            if ai_explanation:
-                st.subheader("Why Nexus Made This Recommendation:")
-                st.markdown(ai_explanation) # Use markdown to render potential formatting
-            else:
-                st.info("No AI explanation available.")
+            # NEW: Stream the AI explanation while the user reads the numbers
+            st.subheader("Why Nexus Made This Recommendation:")
+            explanation_placeholder = st.empty()
+            st.session_state.loop.run_until_complete(
+                stream_ai_explanation(st.session_state.client, recommendation_data, explanation_placeholder)
+            )
 
             st.markdown("---")
             st.subheader("Comparison Across Chains:")